@@ -1,5 +1,8 @@
+import asyncio
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from config import config
 
@@ -17,6 +20,21 @@ class DatabaseClient:
         self.alert_history = None
         self.watchlists = None
         self.banned_users = None  # Admin: banned users
+        self.alert_dedup = None  # Short-lived dedup keys (TTL-expired)
+
+        # Memoized recipient list: a burst of alerts within 30s reuses one
+        # aggregation instead of re-running it per alert. Invalidated by any
+        # write that changes who should receive alerts
+        self._users_cache: tuple = (0.0, [])
+        # Same idea per (alert_type, exchange) for the filtered variant
+        self._alert_users_cache: Dict[tuple, tuple] = {}
+
+        # Alert-history write batching: a burst of spikes queues documents
+        # here and one insert_many flushes them (after 200ms or 50 rows)
+        # instead of paying a round-trip per alert
+        self._pending_alerts: List[Dict] = []
+        self._alert_flush_scheduled = False
+        self._closed = False  # Stops new flush timers once disconnected
     
     async def connect(self):
         """Connect to MongoDB"""
@@ -31,6 +49,7 @@ class DatabaseClient:
             self.alert_history = self.db.alert_history
             self.watchlists = self.db.watchlists
             self.banned_users = self.db.banned_users  # Admin: banned users
+            self.alert_dedup = self.db.alert_dedup
             
             # Create indexes
             await self._create_indexes()
@@ -62,10 +81,19 @@ class DatabaseClient:
         
         # Banned users indexes
         await self.banned_users.create_index("user_id", unique=True)
+
+        # Dedup keys: unique key makes the insert an atomic claim, TTL index
+        # lets MongoDB expire entries at each document's own expires_at
+        await self.alert_dedup.create_index("key", unique=True)
+        await self.alert_dedup.create_index("expires_at", expireAfterSeconds=0)
     
     async def disconnect(self):
         """Disconnect from MongoDB"""
         if self.client:
+            # Don't lose alerts still waiting on the 200ms flush timer, and
+            # stop save_alert from scheduling flushes against a closed client
+            self._closed = True
+            await self._flush_alerts()
             self.client.close()
             print("✓ Disconnected from MongoDB")
     
@@ -101,12 +129,36 @@ class DatabaseClient:
             {"id": user_id},
             {"$set": {"alerts_enabled": enabled}}
         )
+        self._invalidate_users_cache()
     
+    def _invalidate_users_cache(self):
+        """Drop the memoized recipient lists after a membership-affecting write"""
+        self._users_cache = (0.0, [])
+        self._alert_users_cache.clear()
+
     async def get_users_with_alerts_enabled(self) -> List[Dict]:
-        """Get all users with alerts enabled"""
-        # Use aggregation to join with preferences
+        """Get all users with alerts enabled (banned users excluded)
+
+        The result is cached for 30 seconds so alert bursts don't repeat
+        the aggregation; writes that change the recipient set invalidate it.
+        """
+        cached_at, cached_users = self._users_cache
+        if cached_users and time.monotonic() - cached_at < 30.0:
+            return cached_users
+
+        # Use aggregation to join with preferences; the banned_users lookup
+        # filters bans server-side so broadcast loops never need a per-user
+        # is_banned round-trip
         pipeline = [
             {"$match": {"alerts_enabled": True}},
+            {"$lookup": {
+                "from": "banned_users",
+                "localField": "id",
+                "foreignField": "user_id",
+                "as": "ban"
+            }},
+            {"$match": {"ban": {"$size": 0}}},
+            {"$project": {"ban": 0}},
             {"$lookup": {
                 "from": "user_preferences",
                 "localField": "id",
@@ -117,8 +169,67 @@ class DatabaseClient:
         ]
         
         cursor = self.users.aggregate(pipeline)
-        return await cursor.to_list(length=None)
+        users = await cursor.to_list(length=None)
+        self._users_cache = (time.monotonic(), users)
+        return users
     
+    async def get_users_for_alert(self, alert_type: str, exchange: str) -> List[int]:
+        """IDs of unbanned users who should receive this alert.
+
+        The alert-type and exchange predicates run inside the aggregation,
+        so only eligible recipients come back and the send loop does no
+        per-user filtering. Users without stored preferences fall back to
+        the defaults: every type on except daily_dumps, no exchange filter.
+        Cached for 30 seconds per (alert_type, exchange) like the
+        unfiltered recipient list.
+        """
+        cache_key = (alert_type, exchange)
+        cached = self._alert_users_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < 30.0:
+            return cached[1]
+
+        type_field = f"prefs.alert_types.{alert_type}"
+        if alert_type == "daily_dumps":
+            # Default OFF: only an explicit opt-in passes
+            type_match = {type_field: True}
+        else:
+            # Default ON: missing preferences pass, explicit False doesn't
+            type_match = {type_field: {"$ne": False}}
+
+        pipeline = [
+            {"$match": {"alerts_enabled": True}},
+            {"$lookup": {
+                "from": "banned_users",
+                "localField": "id",
+                "foreignField": "user_id",
+                "as": "ban"
+            }},
+            {"$match": {"ban": {"$size": 0}}},
+            {"$lookup": {
+                "from": "user_preferences",
+                "localField": "id",
+                "foreignField": "user_id",
+                "as": "prefs"
+            }},
+            {"$unwind": {"path": "$prefs", "preserveNullAndEmptyArrays": True}},
+            {"$match": {"$and": [
+                type_match,
+                # Missing/null/empty filter means "all exchanges"
+                {"$or": [
+                    {"prefs.alert_exchanges": None},
+                    {"prefs.alert_exchanges": []},
+                    {"prefs.alert_exchanges": exchange},
+                ]},
+            ]}},
+            {"$project": {"_id": 0, "id": 1}},
+        ]
+
+        cursor = self.users.aggregate(pipeline)
+        docs = await cursor.to_list(length=None)
+        user_ids = [doc["id"] for doc in docs]
+        self._alert_users_cache[cache_key] = (time.monotonic(), user_ids)
+        return user_ids
+
     # User preferences operations
     async def get_user_preferences(self, user_id: int) -> Optional[Dict]:
         """Get user preferences"""
@@ -156,6 +267,7 @@ class DatabaseClient:
             {"$set": {"alert_exchanges": exchanges}},
             upsert=True
         )
+        self._invalidate_users_cache()
     
     async def toggle_alert_type(self, user_id: int, alert_type: str) -> bool:
         """Toggle a specific alert type on/off. Returns new state."""
@@ -184,7 +296,8 @@ class DatabaseClient:
             {"$set": {"alert_types": alert_types}},
             upsert=True
         )
-        
+        self._invalidate_users_cache()
+
         return new_state
     
     async def get_user_alert_types(self, user_id: int) -> Dict:
@@ -202,17 +315,56 @@ class DatabaseClient:
             "daily_dumps": False
         }
     
+    # Alert dedup operations
+    async def try_mark_alerted(self, key: str, ttl_seconds: int = 3600) -> bool:
+        """Atomically claim a dedup key. Returns True if this caller got it.
+
+        The unique index makes the insert act like Redis SET NX EX: exactly
+        one worker wins per key, the claim survives restarts, and the TTL
+        index expires it without any Python-side cleanup.
+        """
+        try:
+            await self.alert_dedup.insert_one({
+                "key": key,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
     # Alert history operations
     async def save_alert(self, symbol: str, exchange: str, percent_gain: float):
-        """Save alert to history"""
-        alert = {
+        """Queue an alert for the history log (flushed in bulk)"""
+        self._pending_alerts.append({
             "symbol": symbol,
             "exchange": exchange,
             "percent_gain": percent_gain,
             "alerted_at": datetime.utcnow()
-        }
-        
-        await self.alert_history.insert_one(alert)
+        })
+
+        if len(self._pending_alerts) >= 50:
+            await self._flush_alerts()
+        elif not self._alert_flush_scheduled and not self._closed:
+            # Same batching idiom as the websocket subscribe path: let the
+            # burst accumulate briefly, then write everything in one go
+            self._alert_flush_scheduled = True
+            asyncio.get_running_loop().call_later(
+                0.2, lambda: asyncio.create_task(self._flush_alerts())
+            )
+
+    async def _flush_alerts(self):
+        """Write all queued alerts with a single insert_many"""
+        self._alert_flush_scheduled = False
+        batch, self._pending_alerts = self._pending_alerts, []
+        if not batch:
+            return
+        try:
+            await self.alert_history.insert_many(batch, ordered=False)
+        except Exception as e:
+            # Re-queue at the front so the next flush (or disconnect)
+            # retries the batch instead of silently dropping it
+            self._pending_alerts = batch + self._pending_alerts
+            print(f"✗ Failed to flush {len(batch)} queued alerts: {e}")
     
     async def get_recent_alerts(self, symbol: str, exchange: str, hours: int = 1) -> List[Dict]:
         """Get recent alerts for a symbol/exchange pair"""
@@ -344,11 +496,14 @@ class DatabaseClient:
             "reason": reason,
             "banned_at": datetime.utcnow()
         })
+        self._invalidate_users_cache()
         return True
     
     async def unban_user(self, user_id: int) -> bool:
         """Unban a user. Returns True if unbanned, False if wasn't banned."""
         result = await self.banned_users.delete_one({"user_id": user_id})
+        if result.deleted_count > 0:
+            self._invalidate_users_cache()
         return result.deleted_count > 0
     
     async def is_banned(self, user_id: int) -> bool:
@@ -52,6 +52,9 @@ class ExchangeClient:
     
     def __init__(self):
         self.exchanges = {}
+        # Trade links are pure in (exchange, symbol) and requested once per
+        # alert and per listed coin, so memoize them
+        self._link_cache: Dict[tuple, str] = {}
         self._initialize_exchanges()
     
     def _initialize_exchanges(self):
@@ -66,10 +69,14 @@ class ExchangeClient:
                 print(f"✗ Failed to connect to {name}: {e}")
     
     def _generate_trade_link(self, exchange: str, symbol: str) -> str:
-        """Generate direct trading link for the exchange"""
+        """Generate direct trading link for the exchange (memoized)"""
+        cached = self._link_cache.get((exchange, symbol))
+        if cached is not None:
+            return cached
+
         # Symbol format is typically "BTC" or "BTC/USDT"
         base = symbol.replace("/USDT", "").replace("USDT", "")
-        
+
         links = {
             'binance': f"https://www.binance.com/en/futures/{base}USDT",
             'bybit': f"https://www.bybit.com/trade/usdt/{base}USDT",
@@ -77,7 +84,9 @@ class ExchangeClient:
             'bitget': f"https://www.bitget.com/futures/usdt/{base}USDT",
             'gateio': f"https://www.gate.io/futures_trade/USDT/{base}_USDT",
         }
-        return links.get(exchange, "")
+        url = links.get(exchange, "")
+        self._link_cache[(exchange, symbol)] = url
+        return url
 
     async def _fetch_exchange_tickers(self, exchange_name: str) -> List[Dict]:
         """Fetch and process tickers from an exchange (internal helper)"""
@@ -169,6 +178,19 @@ class ExchangeClient:
         tickers.sort(key=lambda x: x['change_24h'], reverse=False)
         return tickers[:limit]
     
+    async def get_top_movers(self, exchange_name: str, gainers_limit: int = 10,
+                             losers_limit: int = 10) -> tuple:
+        """
+        Get top gainers and losers from a single ticker fetch.
+        One HTTP round-trip instead of two on ccxt's pooled session.
+        """
+        tickers = await self._fetch_exchange_tickers(exchange_name)
+        tickers.sort(key=lambda x: x['change_24h'], reverse=True)
+        gainers = tickers[:gainers_limit]
+        # Biggest drops first, taken from the tail of the same sorted list
+        losers = tickers[-losers_limit:][::-1] if tickers else []
+        return gainers, losers
+    
     async def get_top_gainers_all_exchanges(self, limit: int = 10) -> List[Dict]:
         """Get top gainers across all exchanges"""
         tasks = [self._fetch_exchange_tickers(name) for name in self.exchanges.keys()]
@@ -1,8 +1,39 @@
 import asyncio
 import json
+import logging
+import numpy as np
 import websockets
-from typing import Dict, Set, Callable, Optional
-from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Set, Callable, Optional, Tuple
+
+# orjson is a C JSON codec (~3-5x faster decode) - fall back to stdlib json
+# so the bot still runs on minimal installs
+try:
+    import orjson
+
+    def _loads(msg):
+        return orjson.loads(msg)
+
+    def _dumps(payload) -> str:
+        return orjson.dumps(payload).decode()
+except ImportError:
+    def _loads(msg):
+        return json.loads(msg)
+
+    def _dumps(payload) -> str:
+        return json.dumps(payload)
+
+# Subscribe frames only vary by symbol (which comes from our own poller, so
+# it's trusted) - keep pre-serialized templates and interpolate instead of
+# rebuilding a dict and JSON-encoding it on every send
+_BINANCE_SUB = '{"method":"SUBSCRIBE","params":[%s],"id":1}'
+_BINANCE_UNSUB_STREAM = '{"method":"UNSUBSCRIBE","params":["%s"],"id":1}'
+_MEXC_SUB = '{"method":"sub.depth","param":{"symbol":"%s"}}'
+_MEXC_UNSUB = '{"method":"unsub.depth","param":{"symbol":"%s"}}'
+
+log = logging.getLogger("ws")
+
+__all__ = ["WebSocketClient"]
 
 class WebSocketClient:
     """
@@ -20,33 +51,65 @@ class WebSocketClient:
     
     def __init__(self):
         self.connections: Dict[str, websockets.WebSocketClientProtocol] = {}
-        self.active_subscriptions: Dict[str, Set[str]] = {ex: set() for ex in self.ENDPOINTS}
-        self.order_book_cache: Dict[str, Dict] = {}  # { "symbol": { "bids": [], "asks": [], "timestamp": ... } }
+        # LRU order: most recently used symbols sit at the end, evict from front
+        self.active_subscriptions: Dict[str, "OrderedDict[str, None]"] = {
+            ex: OrderedDict() for ex in self.ENDPOINTS
+        }
+        # SoA layout: per symbol we keep two float64 qty arrays (top 20 levels)
+        # so imbalance reads are vectorized sums instead of per-string float()
+        # Keyed by (exchange, symbol) tuples: hashing two short interned
+        # strings beats building an "exchange:symbol" string per access
+        self.order_book_cache: Dict[Tuple[str, str], Dict] = {}  # { (exchange, symbol): { "bids_qty", "asks_qty", "imb", "ts" } }
         self.is_running = False
-        self._lock = asyncio.Lock()
+        self._runner: Optional[asyncio.Task] = None
+        self._open: Dict[str, bool] = {}  # connection state, maintained by _maintain_connection
         self.last_ping: Dict[str, float] = {}
         
-        # Rate limiting
         self.MAX_SUBSCRIPTIONS = 10  # Max symbols per exchange
-        self.last_subscribe_time: Dict[str, float] = {}  # Rate limit tracking
+        
+        # Subscription batching: buffer symbols briefly, then flush one
+        # coalesced frame per exchange instead of one frame per symbol
+        self._pending_subs: Dict[str, Set[str]] = {ex: set() for ex in self.ENDPOINTS}
+        self._flush_scheduled: Set[str] = set()
+        
+        # Wire-name -> (cache_key, symbol), built at subscribe time so the
+        # message handler avoids split()/f-string work per frame
+        self._stream_to_key: Dict[str, Dict[str, tuple]] = {ex: {} for ex in self.ENDPOINTS}
         
     async def start(self):
         """Start the WebSocket manager"""
         self.is_running = True
-        print("🔌 WebSocket Client initialized (Sniper Mode: Binance + MEXC)")
+        log.info("🔌 WebSocket Client initialized (Sniper Mode: Binance + MEXC)")
         
-        # Start connection loops for supported exchanges
-        for exchange in self.ENDPOINTS:
-            asyncio.create_task(self._maintain_connection(exchange))
-            # Start ping loop for MEXC
-            if exchange == "mexc":
-                asyncio.create_task(self._mexc_heartbeat())
+        # One supervisor task owns all connection loops; TaskGroup keeps
+        # them tracked so a crash propagates instead of vanishing silently
+        self._runner = asyncio.create_task(self._run_connections())
+        self._runner.add_done_callback(self._on_runner_done)
+    
+    async def _run_connections(self):
+        """Run one connection loop per exchange under structured concurrency"""
+        # (MEXC heartbeat rides the recv timeout in _maintain_connection)
+        async with asyncio.TaskGroup() as tg:
+            for exchange in self.ENDPOINTS:
+                tg.create_task(self._maintain_connection(exchange))
+    
+    @staticmethod
+    def _on_runner_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            log.error("WebSocket supervisor crashed: %s", task.exception())
             
     async def stop(self):
         """Stop all connections"""
         self.is_running = False
         for exchange, ws in self.connections.items():
             await ws.close()
+        
+        if self._runner and not self._runner.done():
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
             
     async def subscribe_order_book(self, exchange: str, symbol: str):
         """
@@ -59,60 +122,63 @@ class WebSocketClient:
         if exchange not in self.ENDPOINTS:
             return
             
-        async with self._lock:
-            # Check if already subscribed
-            if symbol in self.active_subscriptions[exchange]:
-                return
-            
-            # Check max subscriptions limit
-            if len(self.active_subscriptions[exchange]) >= self.MAX_SUBSCRIPTIONS:
-                # Remove oldest subscription to make room
-                oldest = next(iter(self.active_subscriptions[exchange]))
-                self.active_subscriptions[exchange].remove(oldest)
-                cache_key = f"{exchange}:{oldest}"
-                if cache_key in self.order_book_cache:
-                    del self.order_book_cache[cache_key]
-                    
-            # Rate limit: wait 0.5s between subscriptions
-            last_time = self.last_subscribe_time.get(exchange, 0)
-            now = asyncio.get_event_loop().time()
-            if now - last_time < 0.5:
-                await asyncio.sleep(0.5 - (now - last_time))
-            
-            self.active_subscriptions[exchange].add(symbol)
-            self.last_subscribe_time[exchange] = asyncio.get_event_loop().time()
-            print(f"🎯 Sniper targeting: {symbol} on {exchange}")
-            
-            # Send subscription message (with error handling)
-            try:
-                if exchange == "binance" and self._is_connected("binance"):
-                    await self._subscribe_binance(symbol)
-                elif exchange == "mexc" and self._is_connected("mexc"):
-                    await self._subscribe_mexc(symbol)
-            except Exception as e:
-                print(f"⚠️ Failed to subscribe {symbol} on {exchange}: {e}")
-                # Remove from active if subscription failed
-                self.active_subscriptions[exchange].discard(symbol)
+        # No lock needed: everything below is synchronous, so it runs
+        # atomically on the event loop; the network send happens later in
+        # _flush_subs and a rare duplicate SUBSCRIBE is harmless
+        subs = self.active_subscriptions[exchange]
+        
+        # Already subscribed: just mark it as recently used
+        if symbol in subs:
+            subs.move_to_end(symbol)
+            return
+        
+        # Check max subscriptions limit
+        if len(subs) >= self.MAX_SUBSCRIPTIONS:
+            # Evict the least recently used symbol to make room. If it was
+            # subscribed within the current flush window it may still be in
+            # the pending buffer - drop it there too, or _flush_subs would
+            # SUBSCRIBE a symbol nothing tracks anymore
+            oldest, _ = subs.popitem(last=False)
+            self._pending_subs[exchange].discard(oldest)
+            self._stream_to_key[exchange].pop(self._stream_name(exchange, oldest), None)
+            self.order_book_cache.pop((exchange, oldest), None)
+                
+        subs[symbol] = None
+        self._stream_to_key[exchange][self._stream_name(exchange, symbol)] = (
+            (exchange, symbol), symbol
+        )
+        log.info("🎯 Sniper targeting: %s on %s", symbol, exchange)
+        
+        # Buffer the subscribe; a short timer coalesces bursts into one flush
+        self._pending_subs[exchange].add(symbol)
+        if exchange not in self._flush_scheduled:
+            self._flush_scheduled.add(exchange)
+            asyncio.get_running_loop().call_later(
+                0.05, lambda ex=exchange: asyncio.create_task(self._flush_subs(ex))
+            )
                 
     async def unsubscribe_order_book(self, exchange: str, symbol: str):
         """Unsubscribe to free up resources"""
         exchange = exchange.lower()
         symbol = symbol.lower()
         
-        async with self._lock:
-            if symbol in self.active_subscriptions[exchange]:
-                self.active_subscriptions[exchange].remove(symbol)
-                
-                # Cleanup cache
-                cache_key = f"{exchange}:{symbol}"
-                if cache_key in self.order_book_cache:
-                    del self.order_book_cache[cache_key]
-                
-                # Send unsubscribe message
-                if exchange == "binance":
-                    await self._unsubscribe_binance(symbol)
-                elif exchange == "mexc":
-                    await self._unsubscribe_mexc(symbol)
+        if symbol not in self.active_subscriptions[exchange]:
+            return
+        
+        # Mutate state synchronously, then hit the network outside it
+        del self.active_subscriptions[exchange][symbol]
+        self._pending_subs[exchange].discard(symbol)
+        wire = self._stream_name(exchange, symbol)
+        self._stream_to_key[exchange].pop(wire, None)
+        
+        # Cleanup cache
+        self.order_book_cache.pop((exchange, symbol), None)
+        
+        # Send unsubscribe message
+        if exchange == "binance":
+            await self._unsubscribe_binance(wire)
+        elif exchange == "mexc":
+            await self._unsubscribe_mexc(wire)
                     
     async def get_order_book_imbalance(self, exchange: str, symbol: str) -> float:
         """
@@ -120,35 +186,55 @@ class WebSocketClient:
         Returns absolute percentage (0-100).
         > 50 means more Buys (Bids).
         """
-        cache_key = f"{exchange.lower()}:{symbol.lower()}"
-        data = self.order_book_cache.get(cache_key)
+        exchange = exchange.lower()
+        symbol = symbol.lower()
+        data = self.order_book_cache.get((exchange, symbol))
         
         if not data:
             return 50.0  # Neutral if no data
-            
-        # Analyze top 20 levels
-        try:
-            bids_volume = sum(float(qty) for price, qty in data['bids'][:20])
-            asks_volume = sum(float(qty) for price, qty in data['asks'][:20])
-        except (ValueError, IndexError):
-            return 50.0 # Bad data
         
-        total_volume = bids_volume + asks_volume
-        if total_volume == 0:
-            return 50.0
-            
-        buy_pressure = (bids_volume / total_volume) * 100
-        return buy_pressure
+        # Reading a symbol marks it hot so the LRU eviction keeps it
+        subs = self.active_subscriptions.get(exchange)
+        if subs is not None and symbol in subs:
+            subs.move_to_end(symbol)
+
+        # Imbalance is computed once per frame in _store_book; reads are
+        # just the cached scalar
+        return data["imb"]
     
-    def _is_connected(self, exchange: str) -> bool:
-        """Check if WebSocket connection is open"""
-        ws = self.connections.get(exchange)
-        if ws is None:
-            return False
-        try:
-            return ws.open
-        except:
-            return False
+    @staticmethod
+    def _stream_name(exchange: str, symbol: str) -> str:
+        """Wire identifier a depth update for this symbol arrives under"""
+        if exchange == "binance":
+            return f"{symbol}@depth20@100ms"
+        # MEXC pushes the futures symbol, e.g. btcusdt -> BTC_USDT
+        return symbol.upper().replace("USDT", "_USDT")
+
+    def _touch(self, exchange: str, symbol: str):
+        """Bump a symbol to most-recently-used so live streams survive eviction"""
+        subs = self.active_subscriptions.get(exchange)
+        if subs is not None and symbol in subs:
+            subs.move_to_end(symbol)
+
+    def _store_book(self, cache_key, bids, asks, now: float):
+        """Cache the parsed book plus its imbalance scalar, computed once per write"""
+        bids_qty = self._qty_array(bids)
+        asks_qty = self._qty_array(asks)
+        bids_volume = float(bids_qty.sum())
+        total_volume = bids_volume + float(asks_qty.sum())
+        self.order_book_cache[cache_key] = {
+            "bids_qty": bids_qty,
+            "asks_qty": asks_qty,
+            "imb": (bids_volume / total_volume) * 100 if total_volume else 50.0,
+            "ts": now
+        }
+
+    @staticmethod
+    def _qty_array(levels) -> np.ndarray:
+        """Extract top-20 quantities from [[price, qty], ...] into a float64 array"""
+        # numpy parses the qty column (strings or numbers) to float64 in C,
+        # instead of a Python-level float() per level
+        return np.array([level[1] for level in levels[:20]], dtype=np.float64)
 
     # ================== INTERNAL METHODS ==================
 
@@ -157,130 +243,159 @@ class WebSocketClient:
         while self.is_running:
             try:
                 uri = self.ENDPOINTS[exchange]
-                async with websockets.connect(uri) as ws:
+                # compression=None: depth frames are small and decode-bound,
+                # permessage-deflate only burns CPU. Depth20 payloads are ~2KB,
+                # so 64KiB frame/stream limits are generous while keeping
+                # buffer churn bounded across reconnects; the library drives
+                # protocol-level ping/pong itself.
+                async with websockets.connect(
+                    uri,
+                    compression=None,
+                    max_size=65536,
+                    max_queue=256,
+                    read_limit=65536,
+                    write_limit=65536,
+                    ping_interval=20,
+                    ping_timeout=20,
+                ) as ws:
                     self.connections[exchange] = ws
-                    print(f"✅ Connected to {exchange} WebSocket")
+                    self._open[exchange] = True
+                    log.info("✅ Connected to %s WebSocket", exchange)
                     
                     # Resubscribe to any active symbols (in case of reconnection)
-                    for symbol in self.active_subscriptions[exchange]:
+                    if self.active_subscriptions[exchange]:
                         if exchange == "binance":
-                            await self._subscribe_binance(symbol)
+                            await self._subscribe_binance(self.active_subscriptions[exchange])
                         elif exchange == "mexc":
-                            await self._subscribe_mexc(symbol)
+                            await asyncio.gather(*[
+                                self._subscribe_mexc(self._stream_name("mexc", s))
+                                for s in self.active_subscriptions[exchange]
+                            ])
                     
+                    # MEXC wants an app-level JSON ping from the client every
+                    # ~30s regardless of traffic (server pushes don't count),
+                    # so track the last ping time; the 15s recv timeout only
+                    # guarantees the check runs even on a silent socket
+                    loop = asyncio.get_running_loop()
+                    recv_timeout = 15 if exchange == "mexc" else 60
+                    self.last_ping[exchange] = loop.time()
+
                     while self.is_running:
                         try:
-                            msg = await asyncio.wait_for(ws.recv(), timeout=60)
-                            await self._handle_message(exchange, msg)
+                            msg = await asyncio.wait_for(ws.recv(), timeout=recv_timeout)
+                            self._handle_message(exchange, msg)
+                            # Drain frames that arrived while we were busy:
+                            # recv() returns without suspending when a message
+                            # is already queued, so bursts are handled in one
+                            # scheduling slot instead of one wakeup per frame
+                            while getattr(ws, "messages", None):
+                                self._handle_message(exchange, await ws.recv())
                         except asyncio.TimeoutError:
-                            # Send ping if needed
-                            if exchange == "mexc":
-                                await ws.send(json.dumps({"method": "PING"}))
+                            pass
+
+                        if exchange == "mexc":
+                            now = loop.time()
+                            if now - self.last_ping[exchange] >= 20.0:
+                                await ws.send(_dumps({"method": "ping"}))
+                                self.last_ping[exchange] = now
                         
             except Exception as e:
-                print(f"⚠️ {exchange} WebSocket error: {e}")
+                log.warning("⚠️ %s WebSocket error: %s", exchange, e)
                 await asyncio.sleep(5)  # Reconnect delay
+            finally:
+                self._open[exchange] = False
 
-    async def _mexc_heartbeat(self):
-        """Send periodic ping to MEXC Futures"""
-        while self.is_running:
-            try:
-                if "mexc" in self.connections and self._is_connected("mexc"):
-                    ws = self.connections["mexc"]
-                    # MEXC Futures ping format
-                    await ws.send(json.dumps({"method": "ping"}))
-            except:
-                pass
-            await asyncio.sleep(20)  # MEXC requires ping every 30s, send at 20s for safety
-
-    async def _handle_message(self, exchange: str, msg: str):
-        """Process incoming messages"""
+    def _handle_message(self, exchange: str, msg):
+        """Process an incoming message (pure CPU work, no awaits)"""
         try:
-            data = json.loads(msg)
+            data = _loads(msg)
+            # One loop.time() per frame; a cheap C-level float, no datetime object
+            now = asyncio.get_running_loop().time()
             
             if exchange == "binance":
-                # Binance structure: {"stream": "btcusdt@depth20", "data": {...}}
+                # Binance structure: {"stream": "btcusdt@depth20@100ms", "data": {...}}
                 if "data" in data and "stream" in data:
-                    stream = data["stream"]
-                    symbol = stream.split("@")[0]
+                    entry = self._stream_to_key[exchange].get(data["stream"])
+                    if not entry:
+                        return
+                    cache_key, symbol = entry
                     content = data["data"]
                     
-                    cache_key = f"{exchange}:{symbol}"
-                    self.order_book_cache[cache_key] = {
-                        "bids": content["bids"],
-                        "asks": content["asks"],
-                        "timestamp": datetime.utcnow()
-                    }
+                    self._touch(exchange, symbol)
+                    self._store_book(cache_key, content["bids"], content["asks"], now)
                     
             elif exchange == "mexc":
                 # MEXC Futures format: {"channel":"push.depth","data":{"asks":[[price,qty]...],"bids":...},"symbol":"BTC_USDT"}
                 if data.get("channel") == "push.depth" and "data" in data:
-                    # Get symbol from response
-                    symbol_raw = data.get("symbol", "")
-                    # Convert BTC_USDT back to btcusdt
-                    symbol = symbol_raw.replace("_", "").lower()
-                    
+                    entry = self._stream_to_key[exchange].get(data.get("symbol", ""))
+                    if not entry:
+                        return
+                    cache_key, symbol = entry
                     content = data["data"]
                     
-                    # MEXC Futures format: [[price, qty, count], ...]
-                    # Normalize to [[price, qty], ...]
-                    bids = [[str(x[0]), str(x[1])] for x in content.get('bids', [])]
-                    asks = [[str(x[0]), str(x[1])] for x in content.get('asks', [])]
-                    
-                    cache_key = f"{exchange}:{symbol}"
-                    self.order_book_cache[cache_key] = {
-                        "bids": bids,
-                        "asks": asks,
-                        "timestamp": datetime.utcnow()
-                    }
+                    # MEXC Futures levels are [[price, qty, count], ...] with
+                    # numeric fields - they feed the qty arrays directly
+                    self._touch(exchange, symbol)
+                    self._store_book(
+                        cache_key, content.get("bids", ()), content.get("asks", ()), now
+                    )
                     
         except Exception as e:
             # print(f"Error parsing message: {e}")
             pass
 
-    async def _subscribe_binance(self, symbol: str):
-        """Send sub request to Binance"""
+    async def _flush_subs(self, exchange: str):
+        """Flush buffered subscriptions in a single batch per exchange"""
+        self._flush_scheduled.discard(exchange)
+        batch = self._pending_subs[exchange]
+        if not batch:
+            return
+        self._pending_subs[exchange] = set()
+        
+        try:
+            if exchange == "binance" and self._open.get("binance"):
+                # Binance accepts multiple streams in one SUBSCRIBE frame
+                await self._subscribe_binance(batch)
+            elif exchange == "mexc" and self._open.get("mexc"):
+                # MEXC needs one frame per symbol, but they can be pipelined
+                await asyncio.gather(*[
+                    self._subscribe_mexc(self._stream_name("mexc", s)) for s in batch
+                ])
+        except Exception as e:
+            log.warning("⚠️ Failed to subscribe batch on %s: %s", exchange, e)
+            # Remove from active if subscription failed
+            for symbol in batch:
+                self.active_subscriptions[exchange].pop(symbol, None)
+                self._stream_to_key[exchange].pop(self._stream_name(exchange, symbol), None)
+
+    async def _subscribe_binance(self, symbols):
+        """Send sub request to Binance (one frame for any number of streams)
+
+        Symbols are already lowercased at the subscribe_order_book boundary.
+        """
         ws = self.connections.get("binance")
         if ws:
-            payload = {
-                "method": "SUBSCRIBE",
-                "params": [f"{symbol.lower()}@depth20@100ms"],
-                "id": 1
-            }
-            await ws.send(json.dumps(payload))
+            params = ",".join('"%s@depth20@100ms"' % s for s in symbols)
+            await ws.send(_BINANCE_SUB % params)
 
-    async def _unsubscribe_binance(self, symbol: str):
-        """Send unsub request to Binance"""
+    async def _unsubscribe_binance(self, wire_stream: str):
+        """Send unsub request to Binance (takes the precomputed stream name)"""
         ws = self.connections.get("binance")
         if ws:
-            payload = {
-                "method": "UNSUBSCRIBE",
-                "params": [f"{symbol.lower()}@depth20@100ms"],
-                "id": 1
-            }
-            await ws.send(json.dumps(payload))
+            await ws.send(_BINANCE_UNSUB_STREAM % wire_stream)
+
+    async def _subscribe_mexc(self, wire_symbol: str):
+        """Send sub request to MEXC Futures
 
-    async def _subscribe_mexc(self, symbol: str):
-        """Send sub request to MEXC Futures"""
-        # MEXC Futures format: {"method":"sub.depth","param":{"symbol":"BTC_USDT"}}
-        # Note: Symbol format is BTC_USDT (with underscore)
+        Takes the precomputed wire symbol (BTC_USDT style) so no case
+        conversion happens per send.
+        """
         ws = self.connections.get("mexc")
         if ws:
-            # Convert btcusdt to BTC_USDT format
-            formatted = symbol.upper().replace("USDT", "_USDT")
-            payload = {
-                "method": "sub.depth",
-                "param": {"symbol": formatted}
-            }
-            await ws.send(json.dumps(payload))
+            await ws.send(_MEXC_SUB % wire_symbol)
 
-    async def _unsubscribe_mexc(self, symbol: str):
-        """Send unsub request to MEXC Futures"""
+    async def _unsubscribe_mexc(self, wire_symbol: str):
+        """Send unsub request to MEXC Futures (takes the precomputed wire symbol)"""
         ws = self.connections.get("mexc")
         if ws:
-            formatted = symbol.upper().replace("USDT", "_USDT")
-            payload = {
-                "method": "unsub.depth",
-                "param": {"symbol": formatted}
-            }
-            await ws.send(json.dumps(payload))
+            await ws.send(_MEXC_UNSUB % wire_symbol)
@@ -1,4 +1,7 @@
 import asyncio
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from database.client import DatabaseClient
 
@@ -8,6 +11,22 @@ from bot.handlers import BotHandlers
 from monitoring.tracker import SpikeTracker
 from monitoring.dex_tracker import DexTracker
 
+def setup_logging() -> QueueListener:
+    """
+    Route log records through a queue to a background listener thread,
+    so hot-path logging never blocks the event loop on stdout writes.
+    """
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    return listener
+
 class TopGainersBot:
     """Main application class"""
     
@@ -125,6 +144,7 @@ class TopGainersBot:
 
 def main():
     """Main entry point"""
+    listener = setup_logging()
     try:
         bot = TopGainersBot()
         bot.run()
@@ -134,9 +154,19 @@ def main():
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     import sys
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    else:
+        # libuv-based loop: noticeably faster for socket-heavy asyncio
+        # (websocket readers + telegram polling); optional dependency
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     main()
\ No newline at end of file
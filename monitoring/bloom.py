@@ -0,0 +1,60 @@
+"""
+Rotating Bloom filter for long-horizon dedup with bounded, tiny memory.
+
+A long-running bot can see millions of tx hashes; keeping each one as a
+dict key costs ~80 bytes. A Bloom filter stores membership in a couple
+of bits per entry at a small false-positive rate - for alert dedup a
+false positive just suppresses one duplicate alert, never emits a wrong
+one.
+"""
+import time
+from hashlib import blake2b
+
+
+class RotatingBloomFilter:
+    """
+    Two-generation Bloom filter with time-based expiry.
+
+    Inserts go to the primary filter, queries check both generations, and
+    every ``rotation_seconds`` the primary is demoted to secondary while a
+    fresh primary starts. Membership therefore lasts between one and two
+    rotation periods, with memory fixed at two bit arrays - no scanning
+    pass is ever needed to expire entries.
+    """
+
+    def __init__(self, size_bits: int = 1 << 20, num_hashes: int = 4,
+                 rotation_seconds: float = 3600.0):
+        self.size = size_bits
+        self.num_hashes = num_hashes
+        self.rotation_seconds = rotation_seconds
+        self._primary = bytearray(size_bits >> 3)
+        self._secondary = bytearray(size_bits >> 3)
+        self._rotated_at = time.monotonic()
+
+    def _indexes(self, key: str):
+        """Derive num_hashes bit positions via double hashing of one digest"""
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.num_hashes)]
+
+    def _maybe_rotate(self):
+        now = time.monotonic()
+        if now - self._rotated_at >= self.rotation_seconds:
+            self._secondary = self._primary
+            self._primary = bytearray(len(self._secondary))
+            self._rotated_at = now
+
+    def add(self, key: str):
+        self._maybe_rotate()
+        primary = self._primary
+        for idx in self._indexes(key):
+            primary[idx >> 3] |= 1 << (idx & 7)
+
+    def __contains__(self, key: str) -> bool:
+        self._maybe_rotate()
+        indexes = self._indexes(key)
+        for bits in (self._primary, self._secondary):
+            if all(bits[idx >> 3] & (1 << (idx & 7)) for idx in indexes):
+                return True
+        return False
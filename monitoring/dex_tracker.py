@@ -1,15 +1,46 @@
 import asyncio
-from datetime import datetime, timedelta
 from typing import Dict, List
 from telegram import Bot
 from telegram.constants import ParseMode
 
 from dex.solana import SolanaClient, TokenActivity, WalletTrade
 from database.client import DatabaseClient
+from monitoring.bloom import RotatingBloomFilter
+from monitoring.rate_limiter import global_limiter, chat_limiter
 from bot.messages import BotMessages
 from config import config
 
 
+# Alert templates live at module scope so each alert interpolates into a
+# prebuilt string instead of rebuilding the multi-line literal per call.
+# (str.format fields - %-style cannot express the {:,} thousands grouping.)
+_BIG_BUY_TPL = (
+    "{emoji} **{title}** {emoji}\n\n"
+    "🪙 **Token:** {token}\n"
+    "💵 **Amount:** ${amount_usd:,.2f}\n"
+    "📊 **Tokens:** {amount_tokens:,.2f}\n"
+    "💲 **Price:** ${price:.8f}\n\n"
+    "👛 **Wallet:** [{wallet_short}]({wallet_link})\n"
+    "🔗 **TX:** [View on Solscan]({tx_link})\n\n"
+    "📈 **Token Stats:**\n"
+    "   • Buyers: {buyers}\n"
+    "   • Sellers: {sellers}\n"
+    "   • Buy Vol: ${buy_volume:,.0f}\n"
+    "   • Sell Vol: ${sell_volume:,.0f}\n\n"
+    "🔗 _Solana DEX_"
+)
+
+_ACTIVITY_TPL = (
+    "🔥 **HIGH DEMAND DETECTED** 🔥\n\n"
+    "🪙 **Token:** {token}\n"
+    "👥 **Buyers:** {buyers} (vs {sellers} sellers)\n"
+    "💵 **Buy Volume:** ${buy_volume:,.0f}\n"
+    "📉 **Sell Volume:** ${sell_volume:,.0f}\n\n"
+    "📊 **Top Buyers:**\n"
+    "{top_buyers}\n"
+    "🔗 _Solana DEX_"
+)
+
 class DexTracker:
     """
     Monitor DEX activity for pump signals.
@@ -33,9 +64,12 @@ class DexTracker:
         
         # Tracking state
         self.is_running = False
-        self.monitored_tokens: Dict[str, datetime] = {}  # token -> last_check
-        self.alerted_big_buys: Dict[str, datetime] = {}  # tx_hash -> alert_time
-        
+        self.monitored_tokens: Dict[str, float] = {}  # token -> last_check (monotonic ts)
+        # tx hashes we already alerted on. The rotating Bloom filter keeps
+        # dedup memory at a fixed couple of bits per hash however long the
+        # bot runs; entries age out after 1-2 rotation periods
+        self.alerted_big_buys = RotatingBloomFilter(rotation_seconds=3600.0)
+
     async def start(self):
         """Start the DEX monitoring loop"""
         self.is_running = True
@@ -62,14 +96,27 @@ class DexTracker:
         # Get top gainers
         gainers = await self.solana.get_top_gainers(limit=30)
         
-        for token in gainers:
+        # Analyze tokens concurrently (bounded, so Birdeye rate limits are
+        # respected), then walk the results in feed order so alert ordering
+        # stays deterministic
+        sem = asyncio.Semaphore(5)
+        
+        async def _analyze(token: Dict):
+            address = token.get("address")
+            if not address:
+                return token, None
+            async with sem:
+                return token, await self.solana.analyze_token(address)
+        
+        results = await asyncio.gather(
+            *[_analyze(t) for t in gainers], return_exceptions=True
+        )
+        
+        for token, result in zip(gainers, results):
             try:
-                address = token.get("address")
-                if not address:
-                    continue
-                    
-                # Analyze token for big buys
-                activity = await self.solana.analyze_token(address)
+                if isinstance(result, BaseException):
+                    raise result
+                _, activity = result
                 
                 if not activity:
                     continue
@@ -77,16 +124,16 @@ class DexTracker:
                 # Check for BIG BUYS (wallet included!)
                 for big_buy in activity.big_buys:
                     if self._should_alert_big_buy(big_buy):
-                        await self._send_big_buy_alert(big_buy, activity)
+                        # Persistent claim: survives restarts and stays
+                        # correct if more than one tracker process runs
+                        if await self.db.try_mark_alerted(f"bb:{big_buy.tx_hash}"):
+                            await self._send_big_buy_alert(big_buy, activity)
                         self._mark_alerted(big_buy.tx_hash)
                         
                 # Optional: Alert on high buyer/seller ratio
                 if activity.unique_buyers > 10 and activity.unique_buyers > activity.unique_sellers * 2:
                     # More buyers than sellers = bullish
                     await self._send_activity_alert(activity)
-                    
-                # Rate limiting
-                await asyncio.sleep(0.5)
                 
             except Exception as e:
                 print(f"Error processing token {token.get('symbol')}: {e}")
@@ -97,31 +144,24 @@ class DexTracker:
         
         # Determine alert type
         if trade.amount_usd >= self.WHALE_BUY_USD:
-            emoji = "🐋"
-            title = "WHALE BUY DETECTED"
+            emoji, title = "🐋", "WHALE BUY DETECTED"
         else:
-            emoji = "💰"
-            title = "BIG BUY DETECTED"
-            
-        # Format wallet (shortened + link)
-        wallet_short = self.solana.format_wallet(trade.wallet)
-        wallet_link = self.solana.get_solscan_link(trade.wallet)
-        tx_link = self.solana.get_tx_link(trade.tx_hash)
-        
-        message = (
-            f"{emoji} **{title}** {emoji}\n\n"
-            f"🪙 **Token:** {trade.token_symbol}\n"
-            f"💵 **Amount:** ${trade.amount_usd:,.2f}\n"
-            f"📊 **Tokens:** {trade.amount_tokens:,.2f}\n"
-            f"💲 **Price:** ${trade.price:.8f}\n\n"
-            f"👛 **Wallet:** [{wallet_short}]({wallet_link})\n"
-            f"🔗 **TX:** [View on Solscan]({tx_link})\n\n"
-            f"📈 **Token Stats:**\n"
-            f"   • Buyers: {activity.unique_buyers}\n"
-            f"   • Sellers: {activity.unique_sellers}\n"
-            f"   • Buy Vol: ${activity.total_buy_volume:,.0f}\n"
-            f"   • Sell Vol: ${activity.total_sell_volume:,.0f}\n\n"
-            f"🔗 _Solana DEX_"
+            emoji, title = "💰", "BIG BUY DETECTED"
+        
+        message = _BIG_BUY_TPL.format(
+            emoji=emoji,
+            title=title,
+            token=trade.token_symbol,
+            amount_usd=trade.amount_usd,
+            amount_tokens=trade.amount_tokens,
+            price=trade.price,
+            wallet_short=self.solana.format_wallet(trade.wallet),
+            wallet_link=self.solana.get_solscan_link(trade.wallet),
+            tx_link=self.solana.get_tx_link(trade.tx_hash),
+            buyers=activity.unique_buyers,
+            sellers=activity.unique_sellers,
+            buy_volume=activity.total_buy_volume,
+            sell_volume=activity.total_sell_volume,
         )
         
         # Send to users with DEX alerts enabled
@@ -130,81 +170,70 @@ class DexTracker:
     async def _send_activity_alert(self, activity: TokenActivity):
         """Send alert for unusual buying activity (many buyers)"""
         
-        message = (
-            f"🔥 **HIGH DEMAND DETECTED** 🔥\n\n"
-            f"🪙 **Token:** {activity.token_symbol}\n"
-            f"👥 **Buyers:** {activity.unique_buyers} (vs {activity.unique_sellers} sellers)\n"
-            f"💵 **Buy Volume:** ${activity.total_buy_volume:,.0f}\n"
-            f"📉 **Sell Volume:** ${activity.total_sell_volume:,.0f}\n\n"
-            f"📊 **Top Buyers:**\n"
-        )
-        
-        # Add top 5 buyers
+        # Build the top-5 buyer lines in one pass, then fill the template
+        buyer_lines = []
         for i, buyer in enumerate(activity.top_buyers[:5], 1):
             wallet_short = self.solana.format_wallet(buyer["wallet"])
             net_vol = buyer.get("net_volume", 0)
-            message += f"   {i}. {wallet_short}: ${net_vol:,.0f}\n"
-            
-        message += f"\n🔗 _Solana DEX_"
+            buyer_lines.append(f"   {i}. {wallet_short}: ${net_vol:,.0f}")
+        
+        message = _ACTIVITY_TPL.format(
+            token=activity.token_symbol,
+            buyers=activity.unique_buyers,
+            sellers=activity.unique_sellers,
+            buy_volume=activity.total_buy_volume,
+            sell_volume=activity.total_sell_volume,
+            top_buyers="\n".join(buyer_lines) + "\n",
+        )
         
         await self._broadcast_dex_alert(message)
         
     async def _broadcast_dex_alert(self, message: str):
         """Send DEX alert to all users with DEX alerts enabled"""
         
-        # Get users with alerts enabled
+        # Get users with alerts enabled (the query already excludes banned users)
         users = await self.db.get_users_with_alerts_enabled()
-        
+
         if not users:
             return
-            
-        for user in users:
+
+        # Fan out concurrently, metered by the shared Telegram token buckets
+        async def _send_one(user: Dict):
             try:
                 user_id = user['id']
-                
+
                 # Check if user has DEX alerts enabled
                 # For now, send to all users with alerts on
                 # TODO: Add dex_alerts preference
-                
-                # Check if banned
-                if await self.db.is_banned(user_id):
-                    continue
-                    
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True
-                )
-                await asyncio.sleep(0.05)
-                
+
+                async with chat_limiter(user_id), global_limiter:
+                    await self.bot.send_message(
+                        chat_id=user_id,
+                        text=message,
+                        parse_mode=ParseMode.MARKDOWN,
+                        disable_web_page_preview=True
+                    )
             except Exception as e:
-                print(f"Failed to send DEX alert to {user_id}: {e}")
-                
+                print(f"Failed to send DEX alert to {user.get('id')}: {e}")
+        
+        await asyncio.gather(*[_send_one(u) for u in users], return_exceptions=True)
+
     def _should_alert_big_buy(self, trade: WalletTrade) -> bool:
         """Check if we should alert on this trade"""
         # Must be above threshold
         if trade.amount_usd < self.BIG_BUY_USD:
             return False
             
-        # Check cooldown (same tx)
+        # Check cooldown (same tx); expiry is handled by the TTL cache
         if trade.tx_hash in self.alerted_big_buys:
-            if datetime.utcnow() - self.alerted_big_buys[trade.tx_hash] < timedelta(hours=1):
-                return False
+            return False
                 
         return True
         
     def _mark_alerted(self, tx_hash: str):
         """Mark transaction as alerted"""
-        self.alerted_big_buys[tx_hash] = datetime.utcnow()
+        self.alerted_big_buys.add(tx_hash)
         
     def _cleanup_old_data(self):
-        """Clean up old tracking data"""
-        cutoff = datetime.utcnow() - timedelta(hours=2)
-        
-        self.alerted_big_buys = {
-            k: v for k, v in self.alerted_big_buys.items()
-            if v > cutoff
-        }
-        
+        """Clean up old tracking data (big-buy dedup expires via filter rotation)"""
         self.solana.cleanup_old_alerts()
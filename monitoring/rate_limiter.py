@@ -0,0 +1,24 @@
+"""
+Shared Telegram send-rate limiting for alert broadcasts.
+
+Telegram allows roughly 30 messages/second across all chats and about
+1 message/second to any single chat. Both trackers share these limiters
+so combined broadcasts stay inside the global budget while still
+bursting as fast as the limits allow.
+"""
+from typing import Dict
+
+from aiolimiter import AsyncLimiter
+
+# Global budget shared by every broadcast in the process
+global_limiter = AsyncLimiter(30, 1)
+
+_chat_limiters: Dict[int, AsyncLimiter] = {}
+
+
+def chat_limiter(chat_id: int) -> AsyncLimiter:
+    """Get (or create) the ~1 msg/s limiter for a single chat"""
+    limiter = _chat_limiters.get(chat_id)
+    if limiter is None:
+        limiter = _chat_limiters[chat_id] = AsyncLimiter(1, 1)
+    return limiter
@@ -1,5 +1,9 @@
 import asyncio
-from datetime import datetime, timedelta
+import logging
+import time
+import numpy as np
+from collections import deque
+from cachetools import TTLCache
 from typing import Dict, List
 from database.client import DatabaseClient
 from telegram import Bot
@@ -7,9 +11,18 @@ from telegram.constants import ParseMode
 
 from exchanges.client import ExchangeClient
 from exchanges.websocket_client import WebSocketClient
+from monitoring.rate_limiter import global_limiter, chat_limiter
 from bot.messages import BotMessages
 from config import config
 
+# Handlers are queue-backed (set up at startup), so emitting a record here
+# never does I/O on the event loop thread
+log = logging.getLogger(__name__)
+
+# Resolved once: the fan-out loops pass this per send, so skip the
+# repeated attribute walk through telegram.constants
+_MARKDOWN = ParseMode.MARKDOWN
+
 class SpikeTracker:
     """Monitor exchanges for sudden price spikes/dumps and alert users"""
     
@@ -32,6 +45,11 @@ class SpikeTracker:
     SCORE_ORDER_BOOK = 20           # Points for high buy pressure (>65%)
     SCORE_ORDER_BOOK_STRONG = 35    # Points for very high buy pressure (>80%)
 
+    # Samples kept per symbol in the price ring buffer. At one sample per
+    # check interval this comfortably covers the volatility window; older
+    # samples are simply overwritten in place
+    PRICE_HISTORY_CAP = 256
+
     def __init__(self, exchange_client: ExchangeClient, bot: Bot, db: DatabaseClient):
         self.exchange_client = exchange_client
         self.ws_client = WebSocketClient()  # Initialize Sniper WebSocket
@@ -40,33 +58,49 @@ class SpikeTracker:
         self.messages = BotMessages()
         
         # Cache previous prices for comparison
-        # Format: { "symbol:exchange": [(price, timestamp), ...] }
-        self.price_history: Dict[str, List[tuple]] = {}
-        
-        # Volume history for spike detection
-        # Format: { "symbol:exchange": [(volume, timestamp), ...] }
-        self.volume_history: Dict[str, List[tuple]] = {}
-        
-        # Track consecutive price movements for momentum
-        # Format: { "symbol:exchange": [change1, change2, change3, ...] }
-        self.momentum_history: Dict[str, List[float]] = {}
-        
-        # Track which spikes we've already alerted on (prevent spam)
-        self.alerted_spikes: Dict[str, datetime] = {}
-        
-        # Track early pump alerts separately (different cooldown)
-        self.alerted_early_pumps: Dict[str, datetime] = {}
+        # SoA layout: preallocated NumPy ring buffers per key - float32
+        # prices and float64 monotonic timestamps instead of thousands of
+        # Python tuples. Appends overwrite in place (head wraps at cap) and
+        # window lookups happen in the batched scan over all rows at once.
+        # Timestamps everywhere in this class are time.monotonic() floats
+        # Format: { "symbol:exchange": {"p": ndarray, "t": ndarray,
+        #                               "head": int, "n": int} }
+        self.price_history: Dict[str, Dict] = {}
+        
+        # Volume history for spike detection. SoA layout: two aligned deques
+        # (timestamps for expiry bookkeeping, volumes for the average) so no
+        # per-sample tuple is allocated; volume_sum carries the running
+        # total so the rolling average is O(1) instead of a re-sum per coin
+        # Format: { "symbol:exchange": (deque[ts_float], deque[volume]) }
+        self.volume_history: Dict[str, tuple] = {}
+        self.volume_sum: Dict[str, float] = {}
+        
+        # Track consecutive price movements for momentum as running state:
+        # a positive-change streak counter plus the last two changes (for
+        # the "gains are accelerating" bonus). O(1) per update, no history
+        # list to scan or store
+        self.positive_streak: Dict[str, int] = {}
+        self.last_two_changes: Dict[str, tuple] = {}
+        
+        # Track which spikes we've already alerted on (prevent spam).
+        # TTLCache expires entries on access after the 1h cooldown and caps
+        # memory, so no periodic pruning pass is needed
+        self.alerted_spikes: TTLCache = TTLCache(maxsize=50_000, ttl=3600)
+        
+        # Track early pump alerts separately (different cooldown); bounded
+        # and TTL-expired like alerted_spikes, so symbol churn can't grow it
+        self.alerted_early_pumps: TTLCache = TTLCache(maxsize=10_000, ttl=1800)
         
         # Track WebSocket subscriptions (for Sniper Mode cleanup)
-        # Format: { "symbol:exchange": timestamp_added }
-        self.active_subscriptions: Dict[str, datetime] = {}
+        # Format: { "symbol:exchange": ts_float_added }
+        self.active_subscriptions: Dict[str, float] = {}
         
         self.is_running = False
     
     async def start(self):
         """Start the monitoring loop"""
         self.is_running = True
-        print("🔍 Spike tracker started")
+        log.info("🔍 Spike tracker started")
         
         # Start WebSocket Client
         await self.ws_client.start()
@@ -78,84 +112,114 @@ class SpikeTracker:
                 self.cleanup_old_history()
                 await asyncio.sleep(config.SPIKE_CHECK_INTERVAL)
             except Exception as e:
-                print(f"Error in spike tracker: {e}")
+                log.exception("Error in spike tracker")
                 await asyncio.sleep(10)  # Wait before retrying
     
     async def stop(self):
         """Stop the monitoring loop"""
         self.is_running = False
         await self.ws_client.stop()
-        print("🛑 Spike tracker stopped")
+        log.info("🛑 Spike tracker stopped")
     
     async def _check_all_exchanges(self):
-        """Check all exchanges for spikes"""
-        for exchange_name in config.EXCHANGES:
-            try:
-                await self._check_exchange_spikes(exchange_name)
-            except Exception as e:
-                print(f"Error checking {exchange_name}: {e}")
+        """Check all exchanges for spikes concurrently"""
+        # Each exchange has its own ccxt client (and rate limiter), so the
+        # checks are independent - run them in parallel and pay only the
+        # slowest exchange's latency per tick
+        await asyncio.gather(
+            *[self._safe_check_exchange(e) for e in config.EXCHANGES],
+            return_exceptions=True
+        )
+    
+    async def _safe_check_exchange(self, exchange_name: str):
+        """Check one exchange, logging (not raising) its failures"""
+        try:
+            await self._check_exchange_spikes(exchange_name)
+        except Exception as e:
+            log.exception("Error checking %s", exchange_name)
     
     async def _check_exchange_spikes(self, exchange_name: str):
         """Check a single exchange for price spikes using multi-factor scoring"""
-        # Get top gainers AND losers for better coverage
-        gainers = await self.exchange_client.get_top_gainers(
-            exchange_name, 
-            limit=50
-        )
-        
-        losers = await self.exchange_client.get_top_losers(
+        # Get top gainers AND losers for better coverage - one ticker fetch
+        # serves both lists instead of hitting the exchange twice per tick
+        gainers, losers = await self.exchange_client.get_top_movers(
             exchange_name,
-            limit=30
+            gainers_limit=50,
+            losers_limit=30
         )
         
-        # Combine and process all coins
-        all_coins = gainers + losers
-        # Remove duplicates based on symbol
-        seen = set()
-        unique_coins = []
-        for coin in all_coins:
-            if coin['symbol'] not in seen:
-                seen.add(coin['symbol'])
-                unique_coins.append(coin)
+        # Combine and dedup by symbol in one pass: losers first so the
+        # gainers entry wins when a symbol appears in both lists
+        by_symbol = {coin['symbol']: coin for coin in losers}
+        by_symbol.update((coin['symbol'], coin) for coin in gainers)
+        unique_coins = list(by_symbol.values())
         
+        now = time.monotonic()
+        cache_keys = []
+
+        # ===== UPDATE HISTORY (pass 1) =====
         for coin in unique_coins:
+            cache_key = f"{coin['symbol']}:{coin['exchange']}"
+            cache_keys.append(cache_key)
+            price = coin['price']
+            volume = coin['volume_24h']
+
+            # 1. Price History (ring buffer: O(1) append, no trimming pass -
+            # expired samples are overwritten once the buffer wraps)
+            prev_price = self._append_price(cache_key, price, now)
+
+            # 2. Volume History (append + bump the running sum)
+            if cache_key not in self.volume_history:
+                self.volume_history[cache_key] = (deque(), deque())
+                self.volume_sum[cache_key] = 0.0
+            vol_ts, vol_vals = self.volume_history[cache_key]
+            vol_ts.append(now)
+            vol_vals.append(volume)
+            self.volume_sum[cache_key] += volume
+
+            # 3. Momentum (track price changes between checks as a running
+            # positive streak plus the last two changes)
+            if prev_price > 0:
+                change = ((price - prev_price) / prev_price) * 100
+                if change > 0:
+                    self.positive_streak[cache_key] = self.positive_streak.get(cache_key, 0) + 1
+                else:
+                    self.positive_streak[cache_key] = 0
+                prev_change = self.last_two_changes.get(cache_key, (0.0, 0.0))[1]
+                self.last_two_changes[cache_key] = (prev_change, change)
+
+        # ===== VOLATILITY + BASE SCORES (pass 2) =====
+        # One vectorized scan over every candidate's ring buffer instead of
+        # a per-symbol Python lookup, then the scalar score factors (volume
+        # spike, volatility, daily trend) for the whole batch in a few
+        # np.where chains
+        volatility_changes = self._batch_volatility_changes(
+            cache_keys,
+            np.array([c['price'] for c in unique_coins], dtype=np.float64),
+            now
+        )
+        base_scores = self._batch_base_scores(
+            cache_keys,
+            np.array([c['volume_24h'] for c in unique_coins], dtype=np.float64),
+            np.array([c['change_24h'] for c in unique_coins], dtype=np.float64),
+            volatility_changes
+        )
+
+        # ===== SCORE AND ALERT (pass 3) =====
+        for i, (coin, cache_key) in enumerate(zip(unique_coins, cache_keys)):
             symbol = coin['symbol']
             exchange = coin['exchange']
             price = coin['price']
             change_24h = coin['change_24h']
             volume = coin['volume_24h']
-            
-            cache_key = f"{symbol}:{exchange}"
-            now = datetime.utcnow()
-            
-            # ===== UPDATE HISTORY =====
-            # 1. Price History
-            if cache_key not in self.price_history:
-                self.price_history[cache_key] = []
-            self.price_history[cache_key].append((price, now))
-            
-            # 2. Volume History
-            if cache_key not in self.volume_history:
-                self.volume_history[cache_key] = []
-            self.volume_history[cache_key].append((volume, now))
-            
-            # 3. Momentum History (track price changes between checks)
-            if cache_key not in self.momentum_history:
-                self.momentum_history[cache_key] = []
-            if len(self.price_history[cache_key]) >= 2:
-                prev_price = self.price_history[cache_key][-2][0]
-                if prev_price > 0:
-                    change = ((price - prev_price) / prev_price) * 100
-                    self.momentum_history[cache_key].append(change)
-                    # Keep only last 10 changes
-                    if len(self.momentum_history[cache_key]) > 10:
-                        self.momentum_history[cache_key] = self.momentum_history[cache_key][-10:]
-            
+            volatility_change = float(volatility_changes[i])
+
             # ===== CALCULATE SCORES =====
-            pump_score = await self._calculate_pump_score(cache_key, price, volume, change_24h, now)
-            
+            pump_score = await self._calculate_pump_score(
+                cache_key, int(base_scores[i]), now
+            )
+
             # ===== ORIGINAL DETECTION (still active) =====
-            volatility_change = self._get_volatility_change(cache_key, price, now)
             is_pump = volatility_change >= self.MIN_VOLATILITY_THRESHOLD
             is_dump = volatility_change <= self.MIN_DUMP_THRESHOLD
             daily_spike = config.MIN_SPIKE_THRESHOLD <= change_24h <= config.MAX_SPIKE_THRESHOLD
@@ -201,90 +265,107 @@ class SpikeTracker:
                     self.alerted_spikes[cache_key] = now
                     await self.db.save_alert(symbol, exchange, change_24h)
 
-    def _check_volatility(self, cache_key: str, current_price: float, current_time: datetime) -> bool:
-        """Check if price moved X% in last Y minutes"""
-        history = self.price_history.get(cache_key, [])
-        if not history:
-            return False
-            
-        # Find price from window ago (e.g. 5 mins)
-        target_time = current_time - timedelta(minutes=self.VOLATILITY_WINDOW_MINUTES)
-        
-        # Find closest entry that is at least window old (or close to it)
-        # Scan history
-        old_price = None
-        for p, t in history:
-            # We want an entry that is roughly window ago. 
-            # If t <= target_time, it means it's older than 5 mins.
-            # We take the most recent entry that satisfies "older than window - buffer"?
-            # Actually, we want the price AT target_time.
-            # If we find a record older than target_time, we can use it.
-            if t <= target_time:
-                 old_price = p
-                 # Continue to find the closest one to target_time? 
-                 # Since list is appended, early entries are oldest. 
-                 # We want the *latest* entry that is <= target_time, 
-                 # OR the earliest entry if we don't have enough history?
-                 # Let's simple pick: Any entry older than 5 mins is a reference point.
-                 # To capture "5% in 5 mins", we check the price 5 mins ago.
-            else:
-                # This entry is newer than target window.
-                # If we found an old_price already, break.
-                if old_price: 
-                    break
-        
-        if old_price and old_price > 0:
-            percent_change = ((current_price - old_price) / old_price) * 100
-            if percent_change >= self.MIN_VOLATILITY_THRESHOLD:
-                # print(f"🚀 VOLATILITY DETECTED: {cache_key} +{percent_change:.2f}% in 5m")
-                return True
-                
-        return False
-
-    def _get_volatility_change(self, cache_key: str, current_price: float, current_time: datetime) -> float:
-        """Helper to get the actual % change for the message"""
-        history = self.price_history.get(cache_key, [])
-        if not history: return 0.0
-        
-        target_time = current_time - timedelta(minutes=self.VOLATILITY_WINDOW_MINUTES)
-        old_price = None
-        for p, t in history:
-            if t <= target_time:
-                 old_price = p
-            else:
-                if old_price: break
-        
-        if old_price and old_price > 0:
-            return ((current_price - old_price) / old_price) * 100
-        return 0.0
-    
-    async def _calculate_pump_score(self, cache_key: str, price: float, volume: float, change_24h: float, now: datetime) -> int:
-        """Calculate pump probability score based on multiple factors"""
-        score = 0
+    def _append_price(self, cache_key: str, price: float, now: float) -> float:
+        """Record a price sample in the symbol's ring buffer.
+
+        Returns the previously recorded price (0.0 if this is the first
+        sample) so the caller can compute momentum without a second lookup.
+        """
+        record = self.price_history.get(cache_key)
+        if record is None:
+            record = {
+                "p": np.zeros(self.PRICE_HISTORY_CAP, dtype=np.float32),
+                "t": np.zeros(self.PRICE_HISTORY_CAP, dtype=np.float64),
+                "head": 0,
+                "n": 0,
+            }
+            self.price_history[cache_key] = record
+
+        head = record["head"]
+        n = record["n"]
+        prev_price = float(record["p"][(head - 1) % self.PRICE_HISTORY_CAP]) if n else 0.0
+        record["p"][head] = price
+        record["t"][head] = now
+        record["head"] = (head + 1) % self.PRICE_HISTORY_CAP
+        record["n"] = min(n + 1, self.PRICE_HISTORY_CAP)
+        return prev_price
+
+    def _batch_volatility_changes(self, cache_keys: List[str], current_prices: np.ndarray, now: float) -> np.ndarray:
+        """Window %-change for every candidate in one vectorized pass.
+
+        Stacks the raw ring buffers into 2D arrays and finds each row's
+        newest sample at/before the window start with a branchless
+        mask+argmax scan - one C pass over all symbols per tick instead of
+        a Python-level searchsorted call per symbol. (The ring rows are not
+        chronologically ordered, which is exactly why argmax-over-masked-
+        timestamps is used rather than a binary search.)
+        """
+        n = len(cache_keys)
+        if not n:
+            return np.zeros(0, dtype=np.float64)
+
+        ts2d = np.stack([self.price_history[k]["t"] for k in cache_keys])
+        p2d = np.stack([self.price_history[k]["p"] for k in cache_keys])
+
+        target_time = now - self.VOLATILITY_WINDOW_MINUTES * 60.0
+        # Unwritten slots hold ts 0.0, so "written and old enough" is one mask
+        eligible = (ts2d > 0.0) & (ts2d <= target_time)
+        has_old = eligible.any(axis=1)
+        idx = np.argmax(np.where(eligible, ts2d, -1.0), axis=1)
+        old_prices = p2d[np.arange(n), idx].astype(np.float64)
+
+        valid = has_old & (old_prices > 0)
+        # Avoid divide-by-zero on rows with no usable sample; they report 0%
+        safe_old = np.where(valid, old_prices, 1.0)
+        return np.where(valid, (current_prices - safe_old) / safe_old * 100.0, 0.0)
+
+    def _batch_base_scores(self, cache_keys: List[str], volumes: np.ndarray, changes_24h: np.ndarray, volatility_changes: np.ndarray) -> np.ndarray:
+        """Scalar score factors for the whole batch in a few vector ops.
+
+        Covers the volume-spike, short-term volatility and daily-trend
+        tiers (Factors 1, 3 and 4); momentum and order-book imbalance stay
+        per-key in _calculate_pump_score.
+        """
+        avg_volumes = np.array([self._get_avg_volume(k) for k in cache_keys], dtype=np.float64)
+        volume_ratios = np.divide(
+            volumes, avg_volumes,
+            out=np.zeros_like(volumes), where=avg_volumes > 0
+        )
+
+        # Factor 1: Volume Spike (30 points)
+        volume_scores = np.where(
+            volume_ratios >= self.VOLUME_SPIKE_MULTIPLIER * 2, self.SCORE_VOLUME_SPIKE,  # 6x average
+            np.where(
+                volume_ratios >= self.VOLUME_SPIKE_MULTIPLIER, int(self.SCORE_VOLUME_SPIKE * 0.7),  # 3x average
+                np.where(volume_ratios >= 2.0, int(self.SCORE_VOLUME_SPIKE * 0.3), 0)  # 2x average
+            )
+        )
+
+        # Factor 3: Short-term volatility (25 points)
+        volatility_scores = np.where(
+            volatility_changes >= 3.0, self.SCORE_VOLATILITY,  # 3%+ gain in 5 mins
+            np.where(volatility_changes >= 1.5, int(self.SCORE_VOLATILITY * 0.5), 0)  # 1.5%+ gain
+        )
+
+        # Factor 4: Daily trend already positive (20 points)
+        trend_scores = np.where(
+            changes_24h >= 10, self.SCORE_DAILY_TREND,  # Already up 10%+ today
+            np.where(changes_24h >= 5, int(self.SCORE_DAILY_TREND * 0.5), 0)  # Up 5%+
+        )
+
+        return volume_scores + volatility_scores + trend_scores
+
+    async def _calculate_pump_score(self, cache_key: str, base_score: int, now: float) -> int:
+        """Add the per-key score factors (momentum, order book) to the
+        vectorized base score and handle the Sniper Mode trigger"""
+        score = base_score
         symbol = cache_key.split(":")[0]
         exchange = cache_key.split(":")[1]
-        
-        # Factor 1: Volume Spike (30 points)
-        volume_score = self._get_volume_spike_score(cache_key, volume)
-        score += volume_score
-        
+
         # Factor 2: Momentum - consecutive gains (25 points)
         momentum_score = self._get_momentum_score(cache_key)
         score += momentum_score
-        
-        # Factor 3: Short-term volatility (25 points)
-        volatility_change = self._get_volatility_change(cache_key, price, now)
-        if volatility_change >= 3.0:  # 3%+ gain in 5 mins
-            score += self.SCORE_VOLATILITY
-        elif volatility_change >= 1.5:  # 1.5%+ gain
-            score += int(self.SCORE_VOLATILITY * 0.5)
-        
-        # Factor 4: Daily trend already positive (20 points)
-        if change_24h >= 10:  # Already up 10%+ today
-            score += self.SCORE_DAILY_TREND
-        elif change_24h >= 5:  # Up 5%+
-            score += int(self.SCORE_DAILY_TREND * 0.5)
-            
+
         # Factor 5: Order Book Imbalance (Sniper Mode)
         # Check if we have data first
         buy_pressure = await self.ws_client.get_order_book_imbalance(exchange, symbol)
@@ -301,104 +382,84 @@ class SpikeTracker:
             if cache_key not in self.active_subscriptions:
                 # Trigger sniper mode: Subscribe to order book
                 asyncio.create_task(self.ws_client.subscribe_order_book(exchange, symbol))
-                self.active_subscriptions[cache_key] = datetime.utcnow()
-            else:
-                # Update timestamp to keep it alive
-                self.active_subscriptions[cache_key] = datetime.utcnow()
+            # Set/refresh timestamp to keep it alive
+            self.active_subscriptions[cache_key] = now
         # If score is low or we already alerted, we could unsubscribe to save resources (optional optimization)
         
         return score
     
-    def _get_volume_spike_score(self, cache_key: str, current_volume: float) -> int:
-        """Check if current volume is significantly higher than average"""
-        history = self.volume_history.get(cache_key, [])
-        
-        if len(history) < 3:  # Need enough history
-            return 0
-        
-        # Calculate average volume (excluding current)
-        volumes = [v for v, t in history[:-1]]
-        if not volumes:
-            return 0
-        
-        avg_volume = sum(volumes) / len(volumes)
-        
-        if avg_volume <= 0:
-            return 0
-        
-        volume_ratio = current_volume / avg_volume
-        
-        if volume_ratio >= self.VOLUME_SPIKE_MULTIPLIER * 2:  # 6x average
-            return self.SCORE_VOLUME_SPIKE
-        elif volume_ratio >= self.VOLUME_SPIKE_MULTIPLIER:  # 3x average
-            return int(self.SCORE_VOLUME_SPIKE * 0.7)
-        elif volume_ratio >= 2.0:  # 2x average
-            return int(self.SCORE_VOLUME_SPIKE * 0.3)
-        
-        return 0
+    def _get_avg_volume(self, cache_key: str) -> float:
+        """Average historical volume for a key (excluding the newest sample).
+
+        Returns 0.0 when there isn't enough history to judge a spike, which
+        zeroes the volume factor in the batch scorer.
+        """
+        history = self.volume_history.get(cache_key)
+        if history is None:
+            return 0.0
+
+        _, vol_vals = history
+        if len(vol_vals) < 3:  # Need enough history
+            return 0.0
+
+        # Running sum minus the current (just-appended) sample: O(1)
+        total = self.volume_sum[cache_key] - vol_vals[-1]
+        return total / (len(vol_vals) - 1)
     
     def _get_momentum_score(self, cache_key: str) -> int:
-        """Check for consecutive positive price movements"""
-        history = self.momentum_history.get(cache_key, [])
-        
-        if len(history) < self.MOMENTUM_CANDLES_REQUIRED:
-            return 0
-        
-        # Check last N entries for consecutive gains
-        recent = history[-self.MOMENTUM_CANDLES_REQUIRED:]
-        consecutive_gains = all(change > 0 for change in recent)
-        
-        if consecutive_gains:
+        """Check for consecutive positive price movements (O(1) counter read)"""
+        streak = self.positive_streak.get(cache_key, 0)
+
+        if streak >= self.MOMENTUM_CANDLES_REQUIRED:
             # Bonus if gains are increasing
-            if len(recent) >= 2 and recent[-1] > recent[-2]:
+            prev_change, last_change = self.last_two_changes[cache_key]
+            if last_change > prev_change:
                 return self.SCORE_MOMENTUM
             return int(self.SCORE_MOMENTUM * 0.7)
-        
-        # Check for at least 2 consecutive gains
-        if len(history) >= 2 and history[-1] > 0 and history[-2] > 0:
+
+        # At least 2 consecutive gains
+        if streak >= 2:
             return int(self.SCORE_MOMENTUM * 0.4)
-        
+
         return 0
     
     async def _should_alert_early_pump(self, cache_key: str) -> bool:
         """Check if we should send early pump alert (30 min cooldown)"""
-        if cache_key in self.alerted_early_pumps:
-            last_alert = self.alerted_early_pumps[cache_key]
-            if datetime.utcnow() - last_alert < timedelta(minutes=30):
-                return False
-        return True
+        # TTLCache expires entries after the cooldown, so membership is
+        # the whole check
+        return cache_key not in self.alerted_early_pumps
 
     def cleanup_old_history(self):
         """Remove history older than window + buffer"""
-        cutoff = datetime.utcnow() - timedelta(minutes=self.VOLATILITY_WINDOW_MINUTES + 10)
+        now = time.monotonic()
+        cutoff = now - (self.VOLATILITY_WINDOW_MINUTES + 10) * 60.0
         
-        # Clean price history
+        # Ring buffers overwrite expired samples in place; here we only drop
+        # keys for symbols that stopped showing up in the gainers feed
         for key in list(self.price_history.keys()):
-            self.price_history[key] = [
-                (p, t) for (p, t) in self.price_history[key]
-                if t > cutoff
-            ]
-            if not self.price_history[key]:
+            record = self.price_history[key]
+            last_ts = record["t"][(record["head"] - 1) % self.PRICE_HISTORY_CAP]
+            if not record["n"] or last_ts <= cutoff:
                 del self.price_history[key]
+                # Momentum state is only meaningful alongside price history
+                self.positive_streak.pop(key, None)
+                self.last_two_changes.pop(key, None)
         
-        # Clean volume history
+        # Clean volume history: entries are appended in time order, so the
+        # expired prefix pops off the deque in O(expired), and the running
+        # sum is decremented to match
         for key in list(self.volume_history.keys()):
-            self.volume_history[key] = [
-                (v, t) for (v, t) in self.volume_history[key]
-                if t > cutoff
-            ]
-            if not self.volume_history[key]:
+            vol_ts, vol_vals = self.volume_history[key]
+            while vol_ts and vol_ts[0] <= cutoff:
+                vol_ts.popleft()
+                self.volume_sum[key] -= vol_vals.popleft()
+            if not vol_ts:
                 del self.volume_history[key]
+                del self.volume_sum[key]
         
-        # Clean old early pump alerts (older than 1 hour)
-        alert_cutoff = datetime.utcnow() - timedelta(hours=1)
-        for key in list(self.alerted_early_pumps.keys()):
-            if self.alerted_early_pumps[key] < alert_cutoff:
-                del self.alerted_early_pumps[key]
-                
         # Clean old WebSocket subscriptions (older than 15 mins)
         # "Sniper Mode" cleanup: Stop watching if no longer interesting
-        ws_cutoff = datetime.utcnow() - timedelta(minutes=15)
+        ws_cutoff = now - 900.0
         for key in list(self.active_subscriptions.keys()):
             if self.active_subscriptions[key] < ws_cutoff:
                 # Unsubscribe
@@ -410,17 +471,20 @@ class SpikeTracker:
     
     async def _should_alert(self, cache_key: str, symbol: str, exchange: str, current_change: float) -> bool:
         """Determine if we should send an alert for this spike"""
-        # Check in-memory cache first (faster)
+        # Check in-memory cache first (faster); TTLCache already expired
+        # anything older than the 1h cooldown
         if cache_key in self.alerted_spikes:
-            last_alert = self.alerted_spikes[cache_key]
-            if datetime.utcnow() - last_alert < timedelta(hours=1):
-                return False  # Don't spam alerts
-        
-        # Check database for recent alerts
-        recent_alerts = await self.db.get_recent_alerts(symbol, exchange, hours=1)
-        if recent_alerts:
+            return False  # Don't spam alerts
+
+        # Atomically claim the 1h dedup key - one op replaces the old
+        # "query recent alert_history rows" check and stays correct even
+        # with multiple tracker processes
+        if not await self.db.try_mark_alerted(f"spike:{symbol}:{exchange}"):
+            # Another worker (or a pre-restart run) already alerted;
+            # remember locally so we skip the DB op until the cooldown ends
+            self.alerted_spikes[cache_key] = time.monotonic()
             return False
-        
+
         return True
     
     async def _send_early_pump_alert(
@@ -432,15 +496,17 @@ class SpikeTracker:
         volume: float,
         pump_score: int
     ):
-        """Send early pump detection alert to all users with alerts enabled"""
-        users = await self.db.get_users_with_alerts_enabled()
-        
-        if not users:
+        """Send early pump detection alert to all eligible users"""
+        # Eligibility (alerts on, type enabled, exchange allowed, unbanned)
+        # is filtered inside the query - only recipients come back
+        user_ids = await self.db.get_users_for_alert('early_pumps', exchange.lower())
+
+        if not user_ids:
             return
-        
+
         # Generate URL
         url = self.exchange_client._generate_trade_link(exchange, symbol)
-        
+
         # Determine confidence level
         if pump_score >= self.HIGH_PUMP_SCORE:
             confidence = "HIGH"
@@ -454,35 +520,22 @@ class SpikeTracker:
             symbol, exchange, price, change_24h, volume, pump_score, confidence, url
         )
         
-        # Send to all users
-        for user in users:
+        # Fan out concurrently like the other alert types; the shared token
+        # buckets keep the burst inside Telegram's limits
+        send = self.bot.send_message
+        async def _send_one(user_id: int):
             try:
-                user_id = user['id']
-                
-                # Check user's alert type preferences
-                alert_types = await self.db.get_user_alert_types(user_id)
-                if not alert_types.get('early_pumps', True):
-                    continue  # User disabled early pump alerts
-                
-                # Check user's exchange preferences
-                prefs = await self.db.get_user_preferences(user_id)
-                if prefs:
-                    allowed_exchanges = prefs.get('alert_exchanges', [])
-                    if allowed_exchanges and exchange.lower() not in [e.lower() for e in allowed_exchanges]:
-                        continue
-                
-                # Check if user is banned
-                if await self.db.is_banned(user_id):
-                    continue
-                
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True
-                )
+                async with chat_limiter(user_id), global_limiter:
+                    await send(
+                        chat_id=user_id,
+                        text=message,
+                        parse_mode=_MARKDOWN,
+                        disable_web_page_preview=True
+                    )
             except Exception as e:
-                print(f"Failed to send early pump alert to {user.get('id')}: {e}")
+                log.warning("Failed to send early pump alert to %s: %s", user_id, e)
+
+        await asyncio.gather(*[_send_one(uid) for uid in user_ids], return_exceptions=True)
     
     async def _send_spike_alert(
         self, 
@@ -494,58 +547,44 @@ class SpikeTracker:
         is_pump: bool = False,
         pump_change: float = 0.0
     ):
-        """Send spike alert to all users with alerts enabled"""
-        # Get all users with alerts enabled (includes preferences from lookup)
-        users = await self.db.get_users_with_alerts_enabled()
-        
-        if not users:
+        """Send spike alert to all eligible users"""
+        # Eligibility is filtered inside the query - only recipients return
+        alert_type = 'confirmed_pumps' if is_pump else 'daily_spikes'
+        user_ids = await self.db.get_users_for_alert(alert_type, exchange.lower())
+
+        if not user_ids:
             return
-            
+
         # Generate URL once
         url = self.exchange_client._generate_trade_link(exchange, symbol)
-        
+
         # Format alert message
         if is_pump:
             message = self.messages.format_pump_alert(
                 symbol, exchange, price, pump_change, volume, url
             )
-            print(f"🚀 Sending PUMP alert: {symbol} on {exchange} (+{pump_change:.2f}% in 5m)")
+            log.info("🚀 Sending PUMP alert: %s on %s (+%.2f%% in 5m)", symbol, exchange, pump_change)
         else:
             message = self.messages.format_spike_alert(
                 symbol, exchange, price, change, volume, url
             )
-            print(f"🚨 Sending spike alert: {symbol} on {exchange} (+{change}%)")
-        
-        # Send to valid users
-        for user in users:
+            log.info("🚨 Sending spike alert: %s on %s (+%s%%)", symbol, exchange, change)
+
+        # Fan out concurrently; the shared token buckets enforce Telegram's
+        # real limits (30/s global, 1/s per chat) instead of a fixed cap
+        send = self.bot.send_message
+        async def _send_one(user_id: int):
             try:
-                user_id = user['id']
-                
-                # Check user's alert type preferences
-                alert_types = await self.db.get_user_alert_types(user_id)
-                if is_pump:
-                    if not alert_types.get('confirmed_pumps', True):
-                        continue  # User disabled confirmed pump alerts
-                else:
-                    if not alert_types.get('daily_spikes', True):
-                        continue  # User disabled daily spike alerts
-                
-                # Check user preferences for exchange filter
-                prefs = user.get('prefs', {})
-                if prefs:
-                    allowed_exchanges = prefs.get('alert_exchanges')
-                    if allowed_exchanges is not None: 
-                        if exchange not in allowed_exchanges:
-                            continue
-                
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                await asyncio.sleep(0.05)  # Rate limiting
+                async with chat_limiter(user_id), global_limiter:
+                    await send(
+                        chat_id=user_id,
+                        text=message,
+                        parse_mode=_MARKDOWN
+                    )
             except Exception as e:
-                print(f"Failed to send alert to user {user['id']}: {e}")
+                log.warning("Failed to send alert to user %s: %s", user_id, e)
+
+        await asyncio.gather(*[_send_one(uid) for uid in user_ids], return_exceptions=True)
     
     async def _send_dump_alert(
         self, 
@@ -557,63 +596,41 @@ class SpikeTracker:
         dump_change: float = 0.0,
         is_daily: bool = False
     ):
-        """Send dump alert to all users with alerts enabled"""
-        # Get all users with alerts enabled (includes preferences from lookup)
-        users = await self.db.get_users_with_alerts_enabled()
-        
-        if not users:
+        """Send dump alert to all eligible users"""
+        # Eligibility is filtered inside the query - only recipients return
+        # (daily_dumps defaults OFF, so it needs an explicit opt-in)
+        alert_type = 'daily_dumps' if is_daily else 'dumps'
+        user_ids = await self.db.get_users_for_alert(alert_type, exchange.lower())
+
+        if not user_ids:
             return
-            
+
         # Generate URL once
         url = self.exchange_client._generate_trade_link(exchange, symbol)
-        
+
         # Format alert message
         if is_daily:
             message = self.messages.format_daily_dump_alert(
                 symbol, exchange, price, change_24h, volume, url
             )
-            print(f"📉 Sending DAILY DUMP alert: {symbol} on {exchange} ({change_24h:.2f}%)")
+            log.info("📉 Sending DAILY DUMP alert: %s on %s (%.2f%%)", symbol, exchange, change_24h)
         else:
             message = self.messages.format_dump_alert(
                 symbol, exchange, price, dump_change, volume, url
             )
-            print(f"💥 Sending DUMP alert: {symbol} on {exchange} ({dump_change:.2f}% in 5m)")
-        
-        # Send to valid users
-        for user in users:
+            log.info("💥 Sending DUMP alert: %s on %s (%.2f%% in 5m)", symbol, exchange, dump_change)
+
+        # Concurrent fan-out, bounded by the shared Telegram token buckets
+        send = self.bot.send_message
+        async def _send_one(user_id: int):
             try:
-                user_id = user['id']
-                
-                # Check user's alert type preferences
-                alert_types = await self.db.get_user_alert_types(user_id)
-                if is_daily:
-                    if not alert_types.get('daily_dumps', False):  # Default OFF
-                        continue  # User disabled daily dump alerts
-                else:
-                    if not alert_types.get('dumps', True):
-                        continue  # User disabled dump alerts
-                
-                # Check user preferences for exchange filter
-                prefs = user.get('prefs', {})
-                if prefs:
-                    allowed_exchanges = prefs.get('alert_exchanges')
-                    if allowed_exchanges is not None: 
-                        if exchange not in allowed_exchanges:
-                            continue
-                
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                await asyncio.sleep(0.05)  # Rate limiting
+                async with chat_limiter(user_id), global_limiter:
+                    await send(
+                        chat_id=user_id,
+                        text=message,
+                        parse_mode=_MARKDOWN
+                    )
             except Exception as e:
-                print(f"Failed to send dump alert to user {user_id}: {e}")
-    
-    def cleanup_old_alerts(self):
-        """Clean up old entries from alerted_spikes cache"""
-        cutoff = datetime.utcnow() - timedelta(hours=2)
-        self.alerted_spikes = {
-            k: v for k, v in self.alerted_spikes.items() 
-            if v > cutoff
-        }
\ No newline at end of file
+                log.warning("Failed to send dump alert to user %s: %s", user_id, e)
+
+        await asyncio.gather(*[_send_one(uid) for uid in user_ids], return_exceptions=True)